@@ -1,11 +1,22 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import before_render_template, template_rendered
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 import json
 import random
 import os
+import hashlib
+import threading
+import time
+import uuid
 from datetime import datetime
 import sys
 
+import rooms
+from cache import (create_cache, attempt_key, stats_key, missed_key, fragment_key,
+                   ATTEMPT_TTL, STATS_TTL, FRAGMENT_TTL, MISSED_TTL)
+
 # Flask アプリケーション作成
 app = Flask(__name__)
 
@@ -22,7 +33,10 @@ if database_url:
         database_url = database_url.replace('postgresql://', 'postgresql+pg8000://', 1)
     
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
-    print(f"✅ PostgreSQL (pg8000) を使用します: {database_url[:30]}...")
+    if database_url.startswith('postgresql+pg8000://'):
+        print(f"✅ PostgreSQL (pg8000) を使用します: {database_url[:30]}...")
+    else:
+        print(f"✅ データベースを使用します: {database_url[:30]}...")
 else:
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///quiz.db'
     print("⚠️ SQLiteデータベースを使用します（開発用）")
@@ -38,13 +52,83 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     # pg8000用のSSL設定
     'connect_args': {
         'ssl_context': True,
-    } if database_url else {}
+    } if database_url and database_url.startswith('postgresql+pg8000://') else {}
 }
 
+# 共有キャッシュ（REDIS_URL があればRedis、なければプロセス内LRU）
+cache = create_cache(os.environ.get('REDIS_URL'))
+
+# テンプレートのバイトコードキャッシュ（新しいワーカーもコンパイル済みの状態で起動）
+def _create_bytecode_cache(directory):
+    """バイトコードキャッシュを作成
+
+    ディレクトリ未指定時はJinja既定のユーザー専用ディレクトリ（0700・所有者確認あり）を使う。
+    指定時も他のユーザーが書き込めるディレクトリは使わない（読み込んだバイトコードは実行されるため）。
+    """
+    if not directory:
+        return FileSystemBytecodeCache()
+    
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.stat(directory)
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        raise OSError(f'{directory} の所有者が現在のユーザーではありません')
+    if st.st_mode & 0o022:
+        raise OSError(f'{directory} は他のユーザーから書き込み可能です')
+    return FileSystemBytecodeCache(directory)
+
+try:
+    app.jinja_env.bytecode_cache = _create_bytecode_cache(os.environ.get('TEMPLATE_CACHE_DIR'))
+except OSError as e:
+    print(f"⚠️ テンプレートキャッシュを使用できません: {e}")
+
+# テンプレートごとの描画時間（/debug で確認）
+_render_times = {}
+_render_local = threading.local()
+
+@before_render_template.connect_via(app)
+def _start_render_timer(sender, template, context, **extra):
+    stack = getattr(_render_local, 'stack', None)
+    if stack is None:
+        stack = _render_local.stack = []
+    stack.append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def _record_render_time(sender, template, context, **extra):
+    stack = getattr(_render_local, 'stack', None)
+    if not stack:
+        return
+    elapsed_ms = (time.perf_counter() - stack.pop()) * 1000
+    entry = _render_times.setdefault(template.name, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+    entry['count'] += 1
+    entry['total_ms'] += elapsed_ms
+    entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+
+def template_render_stats():
+    """テンプレートごとの描画回数・平均/最大時間（ミリ秒）"""
+    return {
+        name: {
+            'count': entry['count'],
+            'avg_ms': round(entry['total_ms'] / entry['count'], 3),
+            'max_ms': round(entry['max_ms'], 3),
+        }
+        for name, entry in sorted(_render_times.items())
+    }
+
+def precompile_templates():
+    """全テンプレートを事前にコンパイルしてバイトコードキャッシュを温める"""
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        try:
+            app.jinja_env.get_template(name)
+        except Exception as e:
+            print(f"⚠️ テンプレートのコンパイルに失敗: {name}: {e}")
+
+precompile_templates()
+
 # モジュールのインポートと初期化
 try:
     import models
     import forms
+    from sqlalchemy.exc import IntegrityError
     print("✅ モジュールのインポートに成功")
     
     # グローバル変数に代入
@@ -137,21 +221,202 @@ SAMPLE_QUESTIONS = [
     }
 ]
 
-def load_questions():
+QUESTIONS_FILE = 'data/questions.json'
+QUESTIONS_CHECK_INTERVAL = 1.0  # 問題ファイルの更新確認間隔（秒）
+
+DIFFICULTY_LEVELS = ['初級', '中級', '上級']
+
+# プロセス内の問題バンク（バージョンはファイル内容のハッシュ）
+# snapshot: {'version', 'questions', 'buckets', 'by_id', 'categories', 'difficulties'}
+_question_bank = {'snapshot': None, 'mtime': None, 'checked_at': 0.0}
+_question_bank_lock = threading.Lock()
+
+def bucket_key(category=None, difficulty=None):
+    """出題バケットのキー（未指定の条件は全件扱い）"""
+    return f"{category or ''}|{difficulty or ''}"
+
+def question_bucket_keys(question):
+    """問題が属する全バケットのキー"""
+    category = question['category']
+    difficulty = question.get('difficulty', '中級')
+    return [
+        bucket_key(),
+        bucket_key(category=category),
+        bucket_key(difficulty=difficulty),
+        bucket_key(category, difficulty),
+    ]
+
+def _build_question_bank(version, questions):
+    """カテゴリ・難易度別の出題バケットを事前計算"""
+    buckets = {}
+    for question in questions:
+        for key in question_bucket_keys(question):
+            buckets.setdefault(key, []).append(question)
+    
+    difficulties = {q.get('difficulty', '中級') for q in questions}
+    return {
+        'version': version,
+        'questions': questions,
+        'buckets': buckets,
+        'by_id': {q['id']: q for q in questions},
+        'categories': sorted({q['category'] for q in questions}),
+        'difficulties': [d for d in DIFFICULTY_LEVELS if d in difficulties]
+                        + sorted(difficulties - set(DIFFICULTY_LEVELS)),
+    }
+
+def _read_questions():
+    """問題ファイルを読み込み、(バージョン, 問題リスト) を返す"""
     try:
-        if os.path.exists('data/questions.json'):
-            with open('data/questions.json', 'r', encoding='utf-8') as f:
-                questions = json.load(f)
-                if questions and len(questions) > 0:
-                    print(f"✅ 問題データを読み込みました: {len(questions)}問")
-                    return questions
+        if os.path.exists(QUESTIONS_FILE):
+            with open(QUESTIONS_FILE, 'rb') as f:
+                raw = f.read()
+            questions = json.loads(raw.decode('utf-8'))
+            if questions and len(questions) > 0:
+                print(f"✅ 問題データを読み込みました: {len(questions)}問")
+                return hashlib.sha1(raw).hexdigest()[:12], questions
         else:
             print("⚠️ data/questions.jsonが見つかりません。サンプルデータを使用します")
     except Exception as e:
         print(f"❌ 問題データ読み込みエラー: {e}")
     
     print(f"📚 サンプル問題データを使用します: {len(SAMPLE_QUESTIONS)}問")
-    return SAMPLE_QUESTIONS
+    return 'sample', SAMPLE_QUESTIONS
+
+def _questions_file_mtime():
+    try:
+        return os.stat(QUESTIONS_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+def load_question_bank():
+    """問題バンクを取得（ファイル更新時のみ再読み込み）
+
+    各ワーカーが QUESTIONS_CHECK_INTERVAL 秒ごとに自分のファイルの mtime を
+    確認して反映する。ノードごとにファイルが異なり得るため、ワーカー間での
+    バージョン通知は行わない。
+    """
+    bank = _question_bank
+    now = time.monotonic()
+    snapshot = bank['snapshot']
+    if snapshot is not None and now - bank['checked_at'] < QUESTIONS_CHECK_INTERVAL:
+        return snapshot
+    
+    with _question_bank_lock:
+        bank['checked_at'] = now
+        mtime = _questions_file_mtime()
+        if bank['snapshot'] is not None and mtime == bank['mtime']:
+            return bank['snapshot']
+        
+        snapshot = _build_question_bank(*_read_questions())
+        bank.update(snapshot=snapshot, mtime=mtime)
+        return snapshot
+
+def load_questions():
+    return load_question_bank()['questions']
+
+def _question_bank_version():
+    snapshot = _question_bank['snapshot']
+    return snapshot['version'] if snapshot else None
+
+def get_stats_snapshot(user):
+    """ユーザー統計のスナップショットを取得（キャッシュ優先）"""
+    key = stats_key(user.id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = user.get_stats().to_dict()
+        cache.set(key, snapshot, ttl=STATS_TTL)
+    return dict(snapshot)
+
+def render_fragment(template_name, user_id, version, context_factory):
+    """ウィジェットをユーザー・統計バージョン単位でキャッシュして描画
+
+    context_factory はキャッシュがないときだけ呼ばれる。
+    """
+    key = fragment_key(template_name, user_id, version)
+    html = cache.get(key)
+    if html is None:
+        html = render_template(template_name, **context_factory())
+        cache.set(key, html, ttl=FRAGMENT_TTL)
+    return Markup(html)
+
+def get_recent_history(user, limit=10):
+    """最近の回答結果"""
+    results = QuizResult.query.filter_by(user_id=user.id).order_by(QuizResult.timestamp.desc()).limit(limit).all()
+    return [{
+        'question': result.question_text,
+        'category': result.category,
+        'is_correct': result.is_correct,
+        'timestamp': result.timestamp.isoformat()
+    } for result in results]
+
+def build_missed_sets(user):
+    """間違えた問題の集合を回答履歴から作り直す
+
+    出題バケットごとの集合は1つのグループとして保存し、グループ単位で
+    失効・破棄されるため一部のバケットだけが欠けることはない。
+    """
+    # 各問題の最新の回答が不正解なら対象
+    latest = {}
+    rows = db.session.query(QuizResult.question_id, QuizResult.is_correct) \
+        .filter_by(user_id=user.id).order_by(QuizResult.timestamp).all()
+    for question_id, is_correct in rows:
+        latest[question_id] = is_correct
+    
+    by_id = load_question_bank()['by_id']
+    buckets = {}
+    for question_id, is_correct in latest.items():
+        if not is_correct and question_id in by_id:
+            for bkey in question_bucket_keys(by_id[question_id]):
+                buckets.setdefault(bkey, []).append(question_id)
+    
+    cache.create_set_group(missed_key(user.id), buckets, ttl=MISSED_TTL)
+
+def with_missed_sets(user, operation):
+    """間違えた問題の集合を操作（グループが失効していれば作り直してから実行）"""
+    key = missed_key(user.id)
+    try:
+        return operation(key)
+    except KeyError:
+        build_missed_sets(user)
+    try:
+        return operation(key)
+    except KeyError:
+        print(f"⚠️ 間違えた問題の集合を作成できません: user_id={user.id}")
+        return None
+
+def update_missed_buckets(user, question, is_correct):
+    """回答結果に応じて間違えた問題の集合を更新"""
+    question_id = question['id']
+    
+    def update(key):
+        for bkey in question_bucket_keys(question):
+            if is_correct:
+                cache.srem(key, bkey, question_id)
+            else:
+                cache.sadd(key, bkey, question_id)
+    
+    with_missed_sets(user, update)
+
+def select_question(category=None, difficulty=None, missed_user=None):
+    """条件に合う問題を事前計算済みバケットから選ぶ（該当なしなら None）"""
+    snapshot = load_question_bank()
+    bkey = bucket_key(category, difficulty)
+    if missed_user is None:
+        bucket = snapshot['buckets'].get(bkey)
+        return random.choice(bucket) if bucket else None
+    
+    def pick(key):
+        while True:
+            question_id = cache.srandmember(key, bkey)
+            if question_id is None:
+                return None
+            question = snapshot['by_id'].get(question_id)
+            if question:
+                return question
+            # 問題ファイルから削除された問題は候補から外す
+            cache.srem(key, bkey, question_id)
+    
+    return with_missed_sets(missed_user, pick)
 
 @app.route('/health')
 def health_check():
@@ -179,6 +444,8 @@ def health_check():
             "database_url_exists": database_url is not None,
             "environment": os.environ.get('FLASK_ENV', 'development'),
             "db_initialized": DB_INITIALIZED,
+            "cache_backend": cache.backend_name,
+            "questions_version": _question_bank_version(),
             "secret_key_set": bool(os.environ.get('SECRET_KEY'))
         })
     except Exception as e:
@@ -242,6 +509,7 @@ def debug_info():
             'modules_status': modules_status,
             'database_info': db_info,
             'tables_info': tables_info,
+            'template_render_times': template_render_stats(),
             'python_version': sys.version,
             'flask_version': app.__class__.__module__
         })
@@ -270,9 +538,10 @@ def login():
             ).first()
             
             if user and user.check_password(form.password.data):
+                # コミットで属性が失効する前にメッセージを作り、再読み込みを避ける
+                flash(f'ようこそ、{user.display_name or user.username}さん！', 'success')
                 login_user(user, remember=form.remember_me.data)
                 user.update_last_login()
-                flash(f'ようこそ、{user.display_name or user.username}さん！', 'success')
                 
                 next_page = request.args.get('next')
                 return redirect(next_page) if next_page else redirect(url_for('index'))
@@ -297,35 +566,32 @@ def register():
     form = RegisterForm()
     if form.validate_on_submit():
         try:
-            # 重複チェック
-            existing_user = User.query.filter(
-                (User.username == form.username.data) | (User.email == form.email.data)
-            ).first()
-            
-            if existing_user:
-                if existing_user.username == form.username.data:
-                    flash('このユーザー名は既に使用されています。', 'error')
-                else:
-                    flash('このメールアドレスは既に使用されています。', 'error')
-                return render_template('auth/register.html', form=form)
-            
+            # 重複チェックは事前に問い合わせず、一意制約違反で検出する
             user = User(
                 username=form.username.data,
                 email=form.email.data,
                 display_name=form.display_name.data or form.username.data
             )
             user.set_password(form.password.data)
+            user.user_stats = UserStats()
             
             db.session.add(user)
-            db.session.flush()  # IDを取得するためにflush
-            
-            stats = UserStats(user_id=user.id)
-            db.session.add(stats)
             db.session.commit()
             
             flash('登録が完了しました！ログインしてください。', 'success')
             return redirect(url_for('login'))
             
+        except IntegrityError:
+            db.session.rollback()
+            existing_user = User.query.filter(
+                (User.username == form.username.data) | (User.email == form.email.data)
+            ).first()
+            if existing_user and existing_user.username == form.username.data:
+                form.username.errors.append('このユーザー名は既に使用されています。別のユーザー名を選択してください。')
+            elif existing_user:
+                form.email.errors.append('このメールアドレスは既に登録されています。')
+            else:
+                flash('登録中にエラーが発生しました。再度お試しください。', 'error')
         except Exception as e:
             db.session.rollback()
             flash('登録中にエラーが発生しました。再度お試しください。', 'error')
@@ -346,37 +612,38 @@ def logout():
 def index():
     try:
         if DB_INITIALIZED and current_user.is_authenticated:
-            stats_obj = current_user.get_stats()
-            stats = stats_obj.to_dict()
-            results = QuizResult.query.filter_by(user_id=current_user.id).order_by(QuizResult.timestamp.desc()).limit(5).all()
-            stats['recent_history'] = [{
-                'question': result.question_text,
-                'category': result.category,
-                'is_correct': result.is_correct,
-                'timestamp': result.timestamp.isoformat()
-            } for result in results]
-        else:
-            stats = {
-                'total_questions': 0,
-                'correct_answers': 0,
-                'categories': {},
-                'recent_history': []
-            }
+            stats = get_stats_snapshot(current_user)
+            stats_widget = render_fragment('partials/index_stats.html', current_user.id, stats.get('version'),
+                                           lambda: {'stats': stats})
+            return render_template('index.html', stats=stats, stats_widget=stats_widget)
         
+        stats = {
+            'total_questions': 0,
+            'correct_answers': 0,
+            'categories': {},
+        }
         return render_template('index.html', stats=stats)
     except Exception as e:
         print(f"❌ ホームページエラー: {e}")
-        return render_template('index.html', stats={'total_questions': 0, 'correct_answers': 0, 'categories': {}, 'recent_history': []})
+        return render_template('index.html', stats={'total_questions': 0, 'correct_answers': 0, 'categories': {}})
 
 @app.route('/quiz')
 def quiz():
     try:
-        questions = load_questions()
-        if not questions:
+        bank = load_question_bank()
+        if not bank['questions']:
             return render_template('error.html', message='問題データが見つかりません')
         
-        session.clear()
-        return render_template('quiz.html')
+        # ログイン状態は残し、出題中の問題のみリセット
+        attempt_id = session.pop('attempt_id', None)
+        if attempt_id:
+            cache.delete(attempt_key(attempt_id))
+        return render_template('quiz.html',
+                               categories=bank['categories'],
+                               difficulties=bank['difficulties'],
+                               selected_category=request.args.get('category', ''),
+                               selected_difficulty=request.args.get('difficulty', ''),
+                               missed_only=request.args.get('missed') == '1')
     except Exception as e:
         print(f"❌ クイズページエラー: {e}")
         return render_template('error.html', message='クイズページの読み込みに失敗しました')
@@ -392,9 +659,14 @@ def dashboard():
         return redirect(url_for('login'))
         
     try:
-        stats_obj = current_user.get_stats()
-        stats = stats_obj.to_dict()
-        return render_template('dashboard.html', stats=stats)
+        stats = get_stats_snapshot(current_user)
+        version = stats.get('version')
+        stats_widget = render_fragment('partials/dashboard_stats.html', current_user.id, version,
+                                       lambda: {'stats': stats})
+        history_widget = render_fragment('partials/recent_history.html', current_user.id, version,
+                                         lambda: {'stats': stats, 'recent_history': get_recent_history(current_user)})
+        return render_template('dashboard.html', stats=stats,
+                               stats_widget=stats_widget, history_widget=history_widget)
     except Exception as e:
         print(f"❌ ダッシュボードエラー: {e}")
         return render_template('error.html', message='ダッシュボードの読み込みに失敗しました')
@@ -410,8 +682,7 @@ def history():
         return redirect(url_for('login'))
         
     try:
-        stats_obj = current_user.get_stats()
-        stats = stats_obj.to_dict()
+        stats = get_stats_snapshot(current_user)
         
         results = QuizResult.query.filter_by(user_id=current_user.id).order_by(QuizResult.timestamp.desc()).all()
         stats['history'] = [{
@@ -434,13 +705,31 @@ def history():
 @app.route('/api/get_question')
 def get_question():
     try:
-        questions = load_questions()
-        
-        if not questions:
+        if not load_questions():
             return jsonify({'error': '問題データがありません'}), 404
         
-        question = random.choice(questions)
-        session['current_question'] = question
+        category = request.args.get('category') or None
+        difficulty = request.args.get('difficulty') or None
+        missed_only = request.args.get('missed') == '1'
+        
+        missed_user = None
+        if missed_only:
+            if not DB_INITIALIZED or not current_user.is_authenticated:
+                return jsonify({'error': '間違えた問題の出題にはログインが必要です'}), 401
+            missed_user = current_user
+        
+        question = select_question(category, difficulty, missed_user)
+        if not question:
+            return jsonify({'error': '条件に合う問題がありません'}), 404
+        
+        # 出題中の問題は共有キャッシュに置き、セッションにはIDのみ保持
+        # （出題ごとに新しいIDにして他ワーカーの古いキャッシュを参照しない）
+        previous_attempt_id = session.get('attempt_id')
+        if previous_attempt_id:
+            cache.delete(attempt_key(previous_attempt_id))
+        attempt_id = uuid.uuid4().hex
+        session['attempt_id'] = attempt_id
+        cache.set(attempt_key(attempt_id), question, ttl=ATTEMPT_TTL)
         
         return jsonify({
             'id': question['id'],
@@ -462,7 +751,9 @@ def submit_answer():
             return jsonify({'error': '回答データが不正です'}), 400
             
         user_answer = data.get('answer')
-        current_question = session.get('current_question')
+        # 出題中の問題は採点時に取り出して消し、同じ問題への再回答を防ぐ
+        attempt_id = session.pop('attempt_id', None)
+        current_question = cache.pop(attempt_key(attempt_id)) if attempt_id else None
         
         if not current_question:
             return jsonify({'error': '問題が見つかりません'}), 400
@@ -491,6 +782,8 @@ def submit_answer():
                 stats.update_stats(current_question['category'], is_correct)
                 
                 db.session.commit()
+                cache.invalidate(stats_key(current_user.id), type='stats', user_id=current_user.id)
+                update_missed_buckets(current_user, current_question, is_correct)
             except Exception as e:
                 print(f"データベース保存エラー: {e}")
                 if db:
@@ -514,8 +807,7 @@ def handle_stats():
         
     try:
         if request.method == 'GET':
-            stats_obj = current_user.get_stats()
-            return jsonify(stats_obj.to_dict())
+            return jsonify(get_stats_snapshot(current_user))
         
         elif request.method == 'DELETE':
             QuizResult.query.filter_by(user_id=current_user.id).delete()
@@ -524,6 +816,8 @@ def handle_stats():
             stats.correct_answers = 0
             stats.set_categories({})
             db.session.commit()
+            cache.invalidate(stats_key(current_user.id), missed_key(current_user.id),
+                             type='stats', user_id=current_user.id)
             
             return jsonify({'message': '統計をリセットしました'})
     except Exception as e:
@@ -532,6 +826,152 @@ def handle_stats():
         print(f"❌ handle_stats エラー: {e}")
         return jsonify({'error': f'サーバーエラー: {str(e)}'}), 500
 
+ROOM_DEFAULT_QUESTIONS = 10
+ROOM_MAX_QUESTIONS = 50
+
+def _room_participant_id(code):
+    return session.get('room_participants', {}).get(code)
+
+def _is_room_host(room):
+    return session.get('room_host_token') == room.host_token
+
+@app.route('/rooms')
+def rooms_index():
+    try:
+        bank = load_question_bank()
+        return render_template('rooms.html',
+                               categories=bank['categories'],
+                               difficulties=bank['difficulties'],
+                               default_questions=ROOM_DEFAULT_QUESTIONS,
+                               max_questions=ROOM_MAX_QUESTIONS)
+    except Exception as e:
+        print(f"❌ ルームページエラー: {e}")
+        return render_template('error.html', message='ルームページの読み込みに失敗しました')
+
+@app.route('/rooms/<code>')
+def room_page(code):
+    try:
+        room = rooms.get_room(code)
+    except rooms.RoomError as e:
+        flash(e.message, 'error')
+        return redirect(url_for('rooms_index'))
+    
+    default_name = ''
+    if DB_INITIALIZED and current_user.is_authenticated:
+        default_name = current_user.display_name or current_user.username
+    return render_template('room.html',
+                           code=code,
+                           is_host=_is_room_host(room),
+                           joined=_room_participant_id(code) in room.participants,
+                           default_name=default_name)
+
+@app.route('/api/rooms', methods=['POST'])
+def create_room():
+    try:
+        data = request.json or {}
+        try:
+            count = int(data.get('count') or ROOM_DEFAULT_QUESTIONS)
+        except (TypeError, ValueError):
+            return jsonify({'error': '問題数が不正です'}), 400
+        count = max(1, min(count, ROOM_MAX_QUESTIONS))
+        
+        key = bucket_key(data.get('category') or None, data.get('difficulty') or None)
+        bucket = load_question_bank()['buckets'].get(key)
+        if not bucket:
+            return jsonify({'error': '条件に合う問題がありません'}), 404
+        
+        host_token = session.get('room_host_token') or uuid.uuid4().hex
+        session['room_host_token'] = host_token
+        room = rooms.create_room(host_token, random.sample(bucket, min(count, len(bucket))))
+        
+        return jsonify({'code': room.code, 'url': url_for('room_page', code=room.code)})
+    except rooms.RoomError as e:
+        return jsonify({'error': e.message}), e.status
+    except Exception as e:
+        print(f"❌ create_room エラー: {e}")
+        return jsonify({'error': f'サーバーエラー: {str(e)}'}), 500
+
+@app.route('/api/rooms/<code>/join', methods=['POST'])
+def join_room(code):
+    try:
+        room = rooms.get_room(code)
+        participant_id = _room_participant_id(code)
+        if participant_id in room.participants:
+            return jsonify({'participant_id': participant_id})
+        
+        name = ((request.json or {}).get('name') or '').strip()[:30]
+        if not name:
+            return jsonify({'error': '表示名を入力してください'}), 400
+        
+        participant_id = room.join(name)
+        participants = dict(session.get('room_participants', {}))
+        participants[code] = participant_id
+        session['room_participants'] = participants
+        
+        return jsonify({'participant_id': participant_id})
+    except rooms.RoomError as e:
+        return jsonify({'error': e.message}), e.status
+    except Exception as e:
+        print(f"❌ join_room エラー: {e}")
+        return jsonify({'error': f'サーバーエラー: {str(e)}'}), 500
+
+@app.route('/api/rooms/<code>/<action>', methods=['POST'])
+def control_room(code, action):
+    """ホストによるルーム操作（next / reveal / finish）"""
+    try:
+        room = rooms.get_room(code)
+        if not _is_room_host(room):
+            return jsonify({'error': 'ホストのみ操作できます'}), 403
+        
+        if action == 'next':
+            room.next_question()
+        elif action == 'reveal':
+            room.reveal()
+        elif action == 'finish':
+            room.finish()
+        else:
+            return jsonify({'error': '不明な操作です'}), 404
+        
+        return jsonify({'state': room.state})
+    except rooms.RoomError as e:
+        return jsonify({'error': e.message}), e.status
+    except Exception as e:
+        print(f"❌ control_room エラー: {e}")
+        return jsonify({'error': f'サーバーエラー: {str(e)}'}), 500
+
+@app.route('/api/rooms/<code>/answer', methods=['POST'])
+def room_answer(code):
+    try:
+        data = request.json
+        if not data or 'answer' not in data:
+            return jsonify({'error': '回答データが不正です'}), 400
+        
+        room = rooms.get_room(code)
+        room.submit_answer(_room_participant_id(code), data.get('answer'))
+        
+        # 正誤は reveal イベントで全員に同時に公開する
+        return jsonify({'accepted': True})
+    except rooms.RoomError as e:
+        return jsonify({'error': e.message}), e.status
+    except Exception as e:
+        print(f"❌ room_answer エラー: {e}")
+        return jsonify({'error': f'サーバーエラー: {str(e)}'}), 500
+
+@app.route('/api/rooms/<code>/events')
+def room_events(code):
+    """ルームのイベントを Server-Sent Events で配信"""
+    try:
+        room = rooms.get_room(code)
+    except rooms.RoomError as e:
+        return jsonify({'error': e.message}), e.status
+    
+    return Response(rooms.stream_room(room),
+                    mimetype='text/event-stream',
+                    headers={
+                        'Cache-Control': 'no-cache',
+                        'X-Accel-Buffering': 'no',
+                    })
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('error.html', message='ページが見つかりません'), 404
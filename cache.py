@@ -0,0 +1,359 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# キャッシュキー・有効期限
+ATTEMPT_TTL = 60 * 60  # 出題中の問題は1時間保持
+STATS_TTL = 5 * 60  # 統計スナップショットは5分保持
+FRAGMENT_TTL = 10 * 60  # 描画済みウィジェットは10分保持
+MISSED_TTL = 24 * 60 * 60  # 間違えた問題の集合は1日で回答履歴から作り直す
+SET_GROUP_GRACE = 60  # Redis上の集合は世代キーより少し長く残す
+NEAR_CACHE_TTL = 1.0  # Redis利用時のプロセス内キャッシュ保持秒数
+
+INVALIDATION_CHANNEL = 'invalidate'
+
+_MISSING = object()
+
+
+def attempt_key(attempt_id):
+    """出題中の問題のキャッシュキー"""
+    return f'attempt:{attempt_id}'
+
+
+def stats_key(user_id):
+    """ユーザー統計スナップショットのキャッシュキー"""
+    return f'stats:{user_id}'
+
+
+def missed_key(user_id):
+    """出題バケットごとの間違えた問題ID集合（集合グループ）のキャッシュキー"""
+    return f'missed:{user_id}'
+
+
+def fragment_key(template_name, user_id, version):
+    """描画済みウィジェットのキャッシュキー（統計バージョンごと）"""
+    return f'fragment:{template_name}:{user_id}:{version}'
+
+
+class _IndexedSet:
+    """追加・削除・ランダム取得がすべて O(1) の集合"""
+
+    def __init__(self):
+        self._items = []
+        self._index = {}
+
+    def add(self, member):
+        if member not in self._index:
+            self._index[member] = len(self._items)
+            self._items.append(member)
+
+    def discard(self, member):
+        pos = self._index.pop(member, None)
+        if pos is None:
+            return
+        last = self._items.pop()
+        if pos < len(self._items):
+            self._items[pos] = last
+            self._index[last] = pos
+
+    def random_member(self):
+        return random.choice(self._items) if self._items else None
+
+
+class LRUCache:
+    """プロセス内LRUキャッシュ（単一インスタンス用）"""
+    backend_name = 'local'
+
+    def __init__(self, maxsize=1024, max_set_groups=1024):
+        self.maxsize = maxsize
+        self.max_set_groups = max_set_groups
+        self._data = OrderedDict()
+        self._set_groups = OrderedDict()
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def get(self, key, default=None):
+        """値を取得（期限切れ・未登録なら default）"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """値を保存（ttl秒で失効、Noneなら無期限）"""
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """値を取得して削除（取得と削除は不可分）"""
+        with self._lock:
+            item = self._data.pop(key, None)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            return default
+        return value
+
+    def delete(self, *keys):
+        """キーを削除"""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._set_groups.pop(key, None)
+
+    def create_set_group(self, key, sets, ttl=None):
+        """集合グループを作り直す（sets: {フィールド: メンバーの列}）
+
+        グループは通常のキャッシュとは別に保持し、失効・破棄はグループ
+        単位で行う。一部の集合だけが消えて空に見えることはない。
+        """
+        group = {}
+        for field, members in sets.items():
+            members_set = _IndexedSet()
+            for member in members:
+                members_set.add(member)
+            group[field] = members_set
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._set_groups[key] = (group, expires_at)
+            self._set_groups.move_to_end(key)
+            while len(self._set_groups) > self.max_set_groups:
+                self._set_groups.popitem(last=False)
+
+    def sadd(self, key, field, *members):
+        """グループ内の集合にメンバーを追加（グループがなければ KeyError）"""
+        with self._lock:
+            group = self._get_set_group(key)
+            members_set = group.get(field)
+            if members_set is None:
+                members_set = group[field] = _IndexedSet()
+            for member in members:
+                members_set.add(member)
+
+    def srem(self, key, field, *members):
+        """グループ内の集合からメンバーを削除（グループがなければ KeyError）"""
+        with self._lock:
+            members_set = self._get_set_group(key).get(field)
+            if members_set is not None:
+                for member in members:
+                    members_set.discard(member)
+
+    def srandmember(self, key, field):
+        """グループ内の集合からランダムに1つ取得（空なら None、グループがなければ KeyError）"""
+        with self._lock:
+            members_set = self._get_set_group(key).get(field)
+            return members_set.random_member() if members_set is not None else None
+
+    def _get_set_group(self, key):
+        item = self._set_groups.get(key)
+        if item is None:
+            raise KeyError(key)
+        group, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._set_groups[key]
+            raise KeyError(key)
+        self._set_groups.move_to_end(key)
+        return group
+
+    def subscribe(self, callback):
+        """無効化メッセージの購読者を登録"""
+        self._subscribers.append(callback)
+
+    def publish(self, message):
+        """無効化メッセージを全ワーカーへ配信"""
+        self._dispatch(message)
+
+    def invalidate(self, *keys, **extra):
+        """キーを削除し、全ワーカーへ無効化を通知"""
+        self.delete(*keys)
+        self.publish(dict(extra, keys=list(keys)))
+
+    def _dispatch(self, message):
+        for callback in list(self._subscribers):
+            try:
+                callback(message)
+            except Exception as e:
+                print(f"⚠️ キャッシュ無効化処理エラー: {e}")
+
+
+class RedisCache(LRUCache):
+    """Redisプロトコルの共有キャッシュ（複数ワーカー・複数ノード用）
+
+    読み取りは NEAR_CACHE_TTL 秒だけプロセス内に保持し、Pub/Subの
+    無効化メッセージを受け取ると全ワーカーで即座に破棄する。
+    値はJSONで保存する。
+    """
+    backend_name = 'redis'
+
+    def __init__(self, client, maxsize=1024, prefix='nikkei-quiz:', near_ttl=NEAR_CACHE_TTL):
+        super().__init__(maxsize)
+        self.client = client
+        self.prefix = prefix
+        self.near_ttl = near_ttl
+        self.channel = prefix + INVALIDATION_CHANNEL
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.channel: self._on_message})
+        self._listener = self._pubsub.run_in_thread(sleep_time=0.1, daemon=True)
+
+    def get(self, key, default=None):
+        value = super().get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            print(f"⚠️ Redis読み込みエラー: {e}")
+            return default
+        if raw is None:
+            return default
+        value = json.loads(raw)
+        super().set(key, value, self.near_ttl)
+        return value
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.client.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=ttl)
+        except Exception as e:
+            print(f"⚠️ Redis書き込みエラー: {e}")
+            return
+        super().set(key, value, min(ttl, self.near_ttl) if ttl else self.near_ttl)
+
+    def pop(self, key, default=None):
+        # プロセス内の写しではなくRedis上の値を不可分に取り出す
+        LRUCache.delete(self, key)
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.get(self.prefix + key)
+            pipe.delete(self.prefix + key)
+            raw, _ = pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Redis読み込みエラー: {e}")
+            return default
+        return json.loads(raw) if raw is not None else default
+
+    def delete(self, *keys):
+        super().delete(*keys)
+        if keys:
+            try:
+                self.client.delete(*[self.prefix + key for key in keys])
+            except Exception as e:
+                print(f"⚠️ Redis削除エラー: {e}")
+
+    # 集合グループはRedis側で直接更新し、プロセス内には保持しない。
+    # グループのキーには世代IDを置き、集合は世代ごとの別キーに置く
+    # （作り直しやリセットは世代キーを消すだけでよい）。
+    def create_set_group(self, key, sets, ttl=None):
+        generation = uuid.uuid4().hex
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            for field, members in sets.items():
+                members = list(members)
+                if not members:
+                    continue
+                set_key = self._set_key(key, generation, field)
+                pipe.sadd(set_key, *members)
+                if ttl:
+                    pipe.expire(set_key, ttl + SET_GROUP_GRACE)
+            pipe.set(self.prefix + key, generation, ex=ttl)
+            pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Redis書き込みエラー: {e}")
+
+    def sadd(self, key, field, *members):
+        generation, ttl_ms = self._set_group_generation(key)
+        if not members:
+            return
+        set_key = self._set_key(key, generation, field)
+        try:
+            pipe = self.client.pipeline()
+            pipe.sadd(set_key, *members)
+            if ttl_ms > 0:
+                pipe.pexpire(set_key, ttl_ms + SET_GROUP_GRACE * 1000)
+            pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Redis書き込みエラー: {e}")
+
+    def srem(self, key, field, *members):
+        generation, _ = self._set_group_generation(key)
+        if not members:
+            return
+        try:
+            self.client.srem(self._set_key(key, generation, field), *members)
+        except Exception as e:
+            print(f"⚠️ Redis書き込みエラー: {e}")
+
+    def srandmember(self, key, field):
+        generation, _ = self._set_group_generation(key)
+        try:
+            member = self.client.srandmember(self._set_key(key, generation, field))
+        except Exception as e:
+            print(f"⚠️ Redis読み込みエラー: {e}")
+            return None
+        return member.decode('utf-8') if isinstance(member, bytes) else member
+
+    def _set_key(self, key, generation, field):
+        return f'{self.prefix}{key}:{generation}:{field}'
+
+    def _set_group_generation(self, key):
+        """(世代ID, 残りミリ秒) を返す（グループがなければ KeyError）"""
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.get(self.prefix + key)
+            pipe.pttl(self.prefix + key)
+            generation, ttl_ms = pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Redis読み込みエラー: {e}")
+            raise KeyError(key) from e
+        if generation is None:
+            raise KeyError(key)
+        return generation.decode('utf-8') if isinstance(generation, bytes) else generation, ttl_ms
+
+    def publish(self, message):
+        try:
+            self.client.publish(self.channel, json.dumps(message, ensure_ascii=False))
+        except Exception as e:
+            print(f"⚠️ Redis配信エラー: {e}")
+            # 少なくとも自ワーカーには反映させる
+            self._dispatch(message)
+
+    def close(self):
+        """購読スレッドを停止"""
+        self._listener.stop()
+        self._pubsub.close()
+
+    def _on_message(self, message):
+        try:
+            payload = json.loads(message['data'])
+        except (TypeError, ValueError):
+            return
+        LRUCache.delete(self, *payload.get('keys', []))
+        self._dispatch(payload)
+
+
+def create_cache(url=None, maxsize=1024):
+    """URLがあればRedisキャッシュ、なければプロセス内LRUキャッシュを作成"""
+    if url:
+        try:
+            import redis
+            client = redis.Redis.from_url(url)
+            client.ping()
+            print(f"✅ Redisキャッシュを使用します: {url.split('@')[-1]}")
+            return RedisCache(client, maxsize=maxsize)
+        except Exception as e:
+            print(f"⚠️ Redisキャッシュに接続できません: {e}")
+    print("⚠️ プロセス内キャッシュを使用します（単一インスタンス用）")
+    return LRUCache(maxsize=maxsize)
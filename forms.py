@@ -1,7 +1,6 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, BooleanField
-from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError
-from models import User
+from wtforms.validators import DataRequired, Email, Length, EqualTo
 
 class LoginForm(FlaskForm):
     """ログインフォーム"""
@@ -13,7 +12,7 @@ class LoginForm(FlaskForm):
     submit = SubmitField('ログイン')
 
 class RegisterForm(FlaskForm):
-    """ユーザー登録フォーム"""
+    """ユーザー登録フォーム（重複チェックは登録時の一意制約で行う）"""
     username = StringField('ユーザー名', 
                           validators=[
                               DataRequired(message='ユーザー名を入力してください'),
@@ -37,15 +36,3 @@ class RegisterForm(FlaskForm):
                                 EqualTo('password', message='パスワードが一致しません')
                             ])
     submit = SubmitField('登録')
-    
-    def validate_username(self, username):
-        """ユーザー名の重複チェック"""
-        user = User.query.filter_by(username=username.data).first()
-        if user:
-            raise ValidationError('このユーザー名は既に使用されています。別のユーザー名を選択してください。')
-    
-    def validate_email(self, email):
-        """メールアドレスの重複チェック"""
-        user = User.query.filter_by(email=email.data).first()
-        if user:
-            raise ValidationError('このメールアドレスは既に登録されています。')
\ No newline at end of file
@@ -1,11 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 
 db = SQLAlchemy()
 
+# 最終ログイン時刻の更新間隔（この間の再ログインでは書き込まない）
+LAST_LOGIN_RESOLUTION = timedelta(minutes=10)
+
 class User(UserMixin, db.Model):
     """ユーザーモデル"""
     __tablename__ = 'users'
@@ -32,9 +35,13 @@ class User(UserMixin, db.Model):
         return check_password_hash(self.password_hash, password)
     
     def update_last_login(self):
-        """最終ログイン時刻を更新"""
-        self.last_login = datetime.utcnow()
+        """最終ログイン時刻を更新（短時間の再ログインはまとめて書き込みを省略）"""
+        now = datetime.utcnow()
+        if self.last_login and now - self.last_login < LAST_LOGIN_RESOLUTION:
+            return False
+        self.last_login = now
         db.session.commit()
+        return True
     
     def get_stats(self):
         """ユーザー統計を取得"""
@@ -131,7 +138,9 @@ class UserStats(db.Model):
             'correct_answers': self.correct_answers,
             'categories': self.get_categories(),
             'history': [],  # 履歴は別途取得
-            'start_date': self.start_date.isoformat() if self.start_date else None
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            # 統計が更新されるたびに変わる値（フラグメントキャッシュのキー）
+            'version': self.last_updated.isoformat() if self.last_updated else None
         }
     
     def __repr__(self):
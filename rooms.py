@@ -0,0 +1,298 @@
+import json
+import random
+import threading
+import time
+import uuid
+
+# ルーム設定
+ROOM_CODE_LENGTH = 6
+ROOM_IDLE_TIMEOUT = 2 * 60 * 60  # 2時間操作がなければ破棄
+FINISHED_ROOM_TTL = 10 * 60  # 終了したルームは10分後に破棄
+CLEANUP_INTERVAL = 60  # 破棄対象ルームの確認間隔（秒）
+MAX_ROOMS = 100  # インスタンス全体で同時に開けるルーム数
+MAX_ROOMS_PER_HOST = 3  # 1セッションで同時に開けるルーム数
+MAX_PARTICIPANTS = 500
+SCOREBOARD_SIZE = 20  # 配信するスコアボードの上位人数
+SCOREBOARD_INTERVAL = 0.5  # スコアボード配信の最短間隔（秒）
+HEARTBEAT_INTERVAL = 15  # SSE接続維持のためのコメント送信間隔（秒）
+
+_rooms = {}
+_rooms_lock = threading.Lock()
+_last_cleanup = 0.0
+
+
+class RoomError(Exception):
+    """ルーム操作エラー（status はHTTPステータス）"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class Room:
+    """ライブクイズルーム（出題・採点・集計をメモリ上で行う）
+
+    状態が変わるたびに events に追記して Condition で待機中の全SSE接続を
+    起こす。スコアボードは回答ごとに作らず、バージョンが変わったときに
+    1回だけ作り直して全接続で共有する。
+    """
+
+    def __init__(self, code, host_token, questions):
+        self.code = code
+        self.host_token = host_token
+        self.questions = questions
+        self.index = -1
+        self.state = 'waiting'  # waiting / question / reveal / finished
+        self.question_started_at = None
+        self.participants = {}
+        self.answers = {}  # 現在の問題への回答: participant_id -> 選択肢番号
+        self.events = []
+        self.board_version = 0
+        self._board_cache = (None, None)
+        self.updated_at = time.monotonic()
+        self._cond = threading.Condition()
+
+    @property
+    def current_question(self):
+        if 0 <= self.index < len(self.questions):
+            return self.questions[self.index]
+        return None
+
+    def join(self, name):
+        """参加者を追加し、参加者IDを返す"""
+        with self._cond:
+            if self.state == 'finished':
+                raise RoomError('このルームは終了しています', 410)
+            if len(self.participants) >= MAX_PARTICIPANTS:
+                raise RoomError('ルームが満員です', 409)
+            participant_id = uuid.uuid4().hex
+            self.participants[participant_id] = {
+                'name': name,
+                'score': 0,
+                'answer_time': 0.0,
+            }
+            self._touch_board()
+            return participant_id
+
+    def next_question(self):
+        """次の問題を出題（最後の問題の後は終了）"""
+        with self._cond:
+            if self.state == 'finished':
+                raise RoomError('このルームは終了しています', 410)
+            self.index += 1
+            self.answers = {}
+            question = self.current_question
+            if question is None:
+                self.state = 'finished'
+                self._emit('finished', {})
+            else:
+                self.state = 'question'
+                self.question_started_at = time.monotonic()
+                self._emit('question', self._public_question())
+            self._touch_board()
+
+    def reveal(self):
+        """正解と解説を公開"""
+        with self._cond:
+            question = self.current_question
+            if self.state != 'question' or question is None:
+                raise RoomError('公開できる問題がありません')
+            self.state = 'reveal'
+            self._emit('reveal', {
+                'index': self.index,
+                'correct_answer': question['correct_answer'],
+                'explanation': question.get('explanation', ''),
+                'source': question.get('source', ''),
+            })
+            self._touch_board()
+
+    def finish(self):
+        """ルームを終了（終了済みなら何もしない）"""
+        with self._cond:
+            if self.state == 'finished':
+                return
+            self.state = 'finished'
+            self._emit('finished', {})
+            self._touch_board()
+
+    def submit_answer(self, participant_id, answer):
+        """回答を採点（1問につき最初の回答のみ有効）"""
+        with self._cond:
+            participant = self.participants.get(participant_id)
+            if participant is None:
+                raise RoomError('ルームに参加していません', 403)
+            question = self.current_question
+            if self.state != 'question' or question is None:
+                raise RoomError('回答を受け付けていません', 409)
+            if participant_id in self.answers:
+                raise RoomError('この問題には回答済みです', 409)
+            if not isinstance(answer, int) or isinstance(answer, bool) or not 0 <= answer < len(question['options']):
+                raise RoomError('回答データが不正です')
+
+            self.answers[participant_id] = answer
+            is_correct = answer == question['correct_answer']
+            if is_correct:
+                participant['score'] += 1
+                participant['answer_time'] += time.monotonic() - self.question_started_at
+            self._touch_board()
+            return is_correct
+
+    def state_payload(self):
+        """接続直後に送る現在の状態と、その時点のイベント位置"""
+        with self._cond:
+            return {
+                'code': self.code,
+                'state': self.state,
+                'total_questions': len(self.questions),
+                'question': self._public_question() if self.state in ('question', 'reveal') else None,
+            }, len(self.events)
+
+    def scoreboard(self):
+        """スコアボード（バージョンごとに1回だけ作成）"""
+        with self._cond:
+            return self._scoreboard()
+
+    def wait(self, last_seq, last_board, timeout=HEARTBEAT_INTERVAL):
+        """新しいイベントかスコアボード更新を待つ
+
+        (新しいイベント, 次のseq, スコアボード or None, スコアボードのバージョン) を返す。
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: len(self.events) > last_seq or self.board_version != last_board,
+                timeout=timeout,
+            )
+            events = self.events[last_seq:]
+            board = self._scoreboard() if self.board_version != last_board else None
+            return events, len(self.events), board, self.board_version
+
+    def _scoreboard(self):
+        version, board = self._board_cache
+        if version == self.board_version:
+            return board
+
+        ranking = sorted(
+            self.participants.values(),
+            key=lambda p: (-p['score'], p['answer_time']),
+        )
+        distribution = [0] * len(self.current_question['options']) if self.current_question else []
+        for answer in self.answers.values():
+            distribution[answer] += 1
+
+        board = {
+            'state': self.state,
+            'index': self.index,
+            'participants': len(self.participants),
+            'answered': len(self.answers),
+            'distribution': distribution,
+            'ranking': [
+                {'rank': rank, 'name': p['name'], 'score': p['score']}
+                for rank, p in enumerate(ranking[:SCOREBOARD_SIZE], start=1)
+            ],
+        }
+        self._board_cache = (self.board_version, board)
+        return board
+
+    def _public_question(self):
+        # 正解・解説は reveal まで送らない
+        question = self.current_question
+        return {
+            'index': self.index,
+            'total_questions': len(self.questions),
+            'id': question['id'],
+            'category': question['category'],
+            'question': question['question'],
+            'options': question['options'],
+            'difficulty': question.get('difficulty', '中級'),
+        }
+
+    def _emit(self, event, data):
+        self.events.append(format_sse(event, data))
+        self._cond.notify_all()
+
+    def _touch_board(self):
+        self.board_version += 1
+        self.updated_at = time.monotonic()
+        self._cond.notify_all()
+
+
+def format_sse(event, data):
+    """Server-Sent Events 形式のメッセージを作成"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream_room(room):
+    """ルームのイベントをSSEで配信するジェネレータ"""
+    payload, last_seq = room.state_payload()
+    yield format_sse('state', payload)
+    if payload['state'] == 'finished':
+        # 終了済みのルームには状態だけ送って閉じる
+        return
+    last_board = None
+    while True:
+        events, last_seq, board, board_version = room.wait(last_seq, last_board)
+        for event in events:
+            yield event
+        if board is not None:
+            last_board = board_version
+            yield format_sse('scoreboard', board)
+        elif not events:
+            yield ': ping\n\n'
+            # 誰も操作しないルームもここで破棄される
+            cleanup_rooms()
+        if room.state == 'finished':
+            return
+        if board is not None and not events:
+            # 回答が集中してもスコアボード配信はまとめて行う
+            time.sleep(SCOREBOARD_INTERVAL)
+
+
+def create_room(host_token, questions):
+    """ルームを作成"""
+    with _rooms_lock:
+        _cleanup_rooms(time.monotonic())
+        active = [room for room in _rooms.values() if room.state != 'finished']
+        if len(active) >= MAX_ROOMS:
+            raise RoomError('現在ルームを作成できません。しばらくしてからお試しください', 429)
+        if sum(1 for room in active if room.host_token == host_token) >= MAX_ROOMS_PER_HOST:
+            raise RoomError(f'同時に作成できるルームは{MAX_ROOMS_PER_HOST}つまでです', 429)
+        while True:
+            code = ''.join(random.choices('0123456789', k=ROOM_CODE_LENGTH))
+            if code not in _rooms:
+                break
+        room = Room(code, host_token, questions)
+        _rooms[code] = room
+        return room
+
+
+def get_room(code):
+    """ルームを取得（存在しなければ RoomError）"""
+    cleanup_rooms()
+    room = _rooms.get(code)
+    if room is None:
+        raise RoomError('ルームが見つかりません', 404)
+    return room
+
+
+def cleanup_rooms():
+    """放置・終了したルームを破棄（CLEANUP_INTERVAL 秒に1回だけ実行）"""
+    global _last_cleanup
+    now = time.monotonic()
+    if now - _last_cleanup < CLEANUP_INTERVAL:
+        return
+    with _rooms_lock:
+        _cleanup_rooms(now)
+
+
+def _cleanup_rooms(now):
+    global _last_cleanup
+    _last_cleanup = now
+    for code, room in list(_rooms.items()):
+        idle = now - room.updated_at
+        if room.state == 'finished' and idle > FINISHED_ROOM_TTL:
+            del _rooms[code]
+        elif idle > ROOM_IDLE_TIMEOUT:
+            # 接続中のSSEには finished を送って終了させる
+            room.finish()
+            del _rooms[code]
@@ -30,4 +30,5 @@ echo "http://localhost:5000 でアクセスできます"
 echo "停止するにはCtrl+Cを押してください"
 echo "-----------------------------------"
 
-python app.py
\ No newline at end of file
+# ライブルームのSSE接続はgeventで処理（ルームはプロセス内に保持するためワーカーは1つ）
+gunicorn -k gevent --worker-connections 1000 --workers 1 -b 0.0.0.0:5000 app:app
\ No newline at end of file
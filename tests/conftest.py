@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# app.py はインポート時にDBを初期化するため、先に一時SQLiteを指定する
+_db_dir = tempfile.mkdtemp(prefix='nikkei-quiz-test-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'test.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as quiz_app  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    quiz_app.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return quiz_app.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+TEST_QUESTIONS = [
+    {
+        'id': 't_001', 'category': '基礎知識', 'difficulty': '初級',
+        'question': '問題1', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': 0,
+        'explanation': '解説1',
+    },
+    {
+        'id': 't_002', 'category': '基礎知識', 'difficulty': '上級',
+        'question': '問題2', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': 1,
+        'explanation': '解説2',
+    },
+    {
+        'id': 't_003', 'category': '経済', 'difficulty': '初級',
+        'question': '問題3', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': 2,
+        'explanation': '解説3',
+    },
+]
+
+
+@pytest.fixture
+def questions(tmp_path, monkeypatch):
+    """問題ファイルをテスト用の3問に差し替える"""
+    path = tmp_path / 'questions.json'
+    path.write_text(json.dumps(TEST_QUESTIONS, ensure_ascii=False), encoding='utf-8')
+    monkeypatch.setattr(quiz_app, 'QUESTIONS_FILE', str(path))
+    monkeypatch.setattr(quiz_app, '_question_bank', {'snapshot': None, 'mtime': None, 'checked_at': 0.0})
+    return {q['id']: q for q in TEST_QUESTIONS}
+
+
+@pytest.fixture
+def new_user_client(app):
+    """新しいユーザーを登録してログイン済みのクライアントを作る"""
+
+    def factory():
+        client = app.test_client()
+        name = 'u' + uuid.uuid4().hex[:10]
+        client.post('/register', data={
+            'username': name,
+            'email': f'{name}@example.com',
+            'password': 'secret1',
+            'password2': 'secret1',
+        })
+        response = client.post('/login', data={'username': name, 'password': 'secret1'})
+        assert response.status_code == 302
+        return client
+
+    return factory
+
+
+@pytest.fixture
+def user_client(new_user_client):
+    return new_user_client()
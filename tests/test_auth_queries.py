@@ -0,0 +1,91 @@
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+import models
+
+
+@pytest.fixture
+def count_queries(app):
+    """実行されたSQL文の種類（INSERT/SELECT など）を記録する"""
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement.split()[0].upper())
+
+        with app.app_context():
+            engine = models.db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    return counter
+
+
+def new_user():
+    name = 'u' + uuid.uuid4().hex[:10]
+    return {
+        'username': name,
+        'email': f'{name}@example.com',
+        'password': 'secret1',
+        'password2': 'secret1',
+    }
+
+
+def register(client, data):
+    return client.post('/register', data=data)
+
+
+def login(client, data):
+    return client.post('/login', data={'username': data['username'], 'password': data['password']})
+
+
+def test_register_inserts_user_and_stats_only(client, count_queries):
+    with count_queries() as statements:
+        response = register(client, new_user())
+
+    assert response.status_code == 302
+    assert statements == ['INSERT', 'INSERT']
+
+
+def test_duplicate_register_looks_up_conflict_once(app, count_queries):
+    data = new_user()
+    register(app.test_client(), data)
+
+    duplicate = dict(data, email='other-' + data['email'])
+    with count_queries() as statements:
+        response = register(app.test_client(), duplicate)
+
+    assert response.status_code == 200
+    assert 'このユーザー名は既に使用されています' in response.get_data(as_text=True)
+    assert statements == ['INSERT', 'SELECT']
+
+
+def test_first_login_selects_and_updates_last_login(app, count_queries):
+    data = new_user()
+    register(app.test_client(), data)
+
+    with count_queries() as statements:
+        response = login(app.test_client(), data)
+
+    assert response.status_code == 302
+    assert statements == ['SELECT', 'UPDATE']
+
+
+def test_repeat_login_within_resolution_skips_write(app, count_queries):
+    data = new_user()
+    register(app.test_client(), data)
+    login(app.test_client(), data)
+
+    with count_queries() as statements:
+        response = login(app.test_client(), data)
+
+    assert response.status_code == 302
+    assert statements == ['SELECT']
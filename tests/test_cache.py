@@ -0,0 +1,180 @@
+import threading
+import time
+
+import fakeredis
+import pytest
+
+import cache as cache_module
+from cache import LRUCache, RedisCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """cache モジュールの time.monotonic を手動で進められる時計に置き換える"""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def redis_pair():
+    """同じ FakeServer を共有する2つの RedisCache（2ワーカー相当）"""
+    server = fakeredis.FakeServer()
+    caches = [
+        RedisCache(fakeredis.FakeRedis(server=server), near_ttl=60)
+        for _ in range(2)
+    ]
+    yield caches
+    for c in caches:
+        c.close()
+
+
+def wait_until(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def test_lru_ttl_expiry(clock):
+    c = LRUCache()
+    c.set('a', 1, ttl=10)
+    c.set('b', 2)
+
+    clock[0] += 9
+    assert c.get('a') == 1
+    clock[0] += 2
+    assert c.get('a') is None
+    assert c.get('b') == 2
+
+
+def test_lru_evicts_least_recently_used():
+    c = LRUCache(maxsize=2)
+    c.set('a', 1)
+    c.set('b', 2)
+    c.get('a')
+    c.set('c', 3)
+
+    assert c.get('a') == 1
+    assert c.get('b') is None
+    assert c.get('c') == 3
+
+
+def test_lru_pop_is_atomic():
+    c = LRUCache()
+    c.set('attempt', {'id': 'q1'})
+    results = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        results.append(c.pop('attempt'))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert [r for r in results if r is not None] == [{'id': 'q1'}]
+    assert c.get('attempt') is None
+
+
+def test_lru_pop_ignores_expired(clock):
+    c = LRUCache()
+    c.set('a', 1, ttl=5)
+    clock[0] += 6
+    assert c.pop('a') is None
+
+
+def test_lru_set_group_operations():
+    c = LRUCache()
+    with pytest.raises(KeyError):
+        c.srandmember('g', 'all')
+
+    c.create_set_group('g', {'all': ['q1', 'q2']})
+    assert c.srandmember('g', 'all') in ('q1', 'q2')
+    assert c.srandmember('g', 'other') is None
+
+    c.srem('g', 'all', 'q1', 'q2')
+    assert c.srandmember('g', 'all') is None
+    c.sadd('g', 'other', 'q3')
+    assert c.srandmember('g', 'other') == 'q3'
+
+    c.delete('g')
+    with pytest.raises(KeyError):
+        c.sadd('g', 'all', 'q1')
+
+
+def test_lru_set_group_expires_as_a_unit(clock):
+    c = LRUCache()
+    c.create_set_group('g', {'a': ['q1'], 'b': ['q2']}, ttl=10)
+    clock[0] += 11
+    with pytest.raises(KeyError):
+        c.srandmember('g', 'a')
+    with pytest.raises(KeyError):
+        c.srandmember('g', 'b')
+
+
+def test_lru_set_groups_survive_general_eviction():
+    c = LRUCache(maxsize=2)
+    c.create_set_group('g', {'a': ['q1']})
+    for i in range(10):
+        c.set(f'k{i}', i)
+    assert c.srandmember('g', 'a') == 'q1'
+
+
+def test_redis_get_set_and_ttl(redis_pair):
+    a, b = redis_pair
+    a.set('k', {'value': 1}, ttl=30)
+
+    assert b.get('k') == {'value': 1}
+    assert 0 < a.client.ttl(a.prefix + 'k') <= 30
+    assert b.get('missing', 'default') == 'default'
+
+
+def test_redis_pop_reads_shared_value_once(redis_pair):
+    a, b = redis_pair
+    a.set('attempt', {'id': 'q1'})
+    # b のプロセス内の写しを作っておく
+    assert b.get('attempt') == {'id': 'q1'}
+
+    assert a.pop('attempt') == {'id': 'q1'}
+    assert b.pop('attempt') is None
+
+
+def test_redis_set_group_operations(redis_pair):
+    a, b = redis_pair
+    with pytest.raises(KeyError):
+        a.srandmember('g', 'all')
+
+    a.create_set_group('g', {'all': ['q1']}, ttl=60)
+    b.sadd('g', 'all', 'q2')
+    assert a.srandmember('g', 'all') in ('q1', 'q2')
+
+    b.srem('g', 'all', 'q1', 'q2')
+    assert a.srandmember('g', 'all') is None
+
+    a.invalidate('g')
+    with pytest.raises(KeyError):
+        b.srandmember('g', 'all')
+
+
+def test_redis_invalidate_evicts_near_cache_on_other_worker(redis_pair):
+    a, b = redis_pair
+    received = []
+    b.subscribe(received.append)
+
+    a.set('stats:1', {'total': 1})
+    assert b.get('stats:1') == {'total': 1}
+
+    # 共有側だけを書き換えても near_ttl の間は b の写しが返る
+    a.client.set(a.prefix + 'stats:1', '{"total": 2}')
+    assert b.get('stats:1') == {'total': 1}
+
+    a.invalidate('stats:1', type='stats', user_id=1)
+    assert wait_until(lambda: b.get('stats:1') is None)
+    assert wait_until(lambda: received)
+    assert received[0] == {'type': 'stats', 'user_id': 1, 'keys': ['stats:1']}
@@ -0,0 +1,90 @@
+from contextlib import contextmanager
+
+import pytest
+from flask import template_rendered
+
+import app as quiz_app
+
+
+@pytest.fixture
+def rendered(app):
+    """描画されたテンプレート名を記録する"""
+
+    @contextmanager
+    def recorder():
+        names = []
+
+        def record(sender, template, context, **extra):
+            names.append(template.name)
+
+        template_rendered.connect(record, app)
+        try:
+            yield names
+        finally:
+            template_rendered.disconnect(record, app)
+
+    return recorder
+
+
+def answer_question(client, correct=True):
+    question = client.get('/api/get_question').get_json()
+    current = quiz_app.load_question_bank()['by_id'][question['id']]
+    choice = current['correct_answer'] if correct else (current['correct_answer'] + 1) % len(current['options'])
+    assert client.post('/api/submit_answer', json={'answer': choice}).status_code == 200
+
+
+def test_render_fragment_reuses_html_per_version(app):
+    calls = []
+
+    def context():
+        calls.append(1)
+        return {'stats': {'total_questions': 3, 'correct_answers': 2, 'categories': {}}}
+
+    with app.test_request_context():
+        first = quiz_app.render_fragment('partials/index_stats.html', 'fragment-test', 'v1', context)
+        second = quiz_app.render_fragment('partials/index_stats.html', 'fragment-test', 'v1', context)
+        assert second == first
+        assert len(calls) == 1
+
+        quiz_app.render_fragment('partials/index_stats.html', 'fragment-test', 'v2', context)
+        assert len(calls) == 2
+
+
+def test_dashboard_widget_cached_until_stats_change(user_client, questions, rendered):
+    answer_question(user_client)
+    user_client.get('/dashboard')
+
+    with rendered() as names:
+        first = user_client.get('/dashboard').get_data(as_text=True)
+    assert 'dashboard.html' in names
+    assert 'partials/dashboard_stats.html' not in names
+
+    answer_question(user_client, correct=False)
+    with rendered() as names:
+        second = user_client.get('/dashboard').get_data(as_text=True)
+    assert 'partials/dashboard_stats.html' in names
+    assert second != first
+
+    assert user_client.delete('/api/stats').status_code == 200
+    with rendered() as names:
+        third = user_client.get('/dashboard').get_data(as_text=True)
+    assert 'partials/dashboard_stats.html' in names
+    assert third not in (first, second)
+
+
+def test_index_widget_reflects_submitted_answer(user_client, questions):
+    answer_question(user_client)
+    before = user_client.get('/').get_data(as_text=True)
+    answer_question(user_client)
+    after = user_client.get('/').get_data(as_text=True)
+
+    assert before != after
+    assert '<div class="stat-number">2</div>' in after
+
+
+def test_debug_reports_template_render_times(client):
+    client.get('/')
+    times = client.get('/debug').get_json()['template_render_times']
+
+    assert times['index.html']['count'] >= 1
+    assert set(times['index.html']) == {'count', 'avg_ms', 'max_ms'}
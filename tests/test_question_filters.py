@@ -0,0 +1,101 @@
+import pytest
+
+import app as quiz_app
+from cache import LRUCache
+
+
+def get_question(client, **params):
+    return client.get('/api/get_question', query_string=params)
+
+
+def answer(client, question, correct):
+    """出題中の問題に正解または不正解で回答する"""
+    choice = question['correct_answer']
+    if not correct:
+        choice = (choice + 1) % len(question['options'])
+    response = client.post('/api/submit_answer', json={'answer': choice})
+    assert response.status_code == 200
+    assert response.get_json()['correct'] is correct
+
+
+def miss(client, questions, question_id):
+    """指定した問題を出題させて間違える"""
+    question = questions[question_id]
+    response = get_question(client, category=question['category'], difficulty=question['difficulty'])
+    assert response.get_json()['id'] == question_id
+    answer(client, question, correct=False)
+
+
+@pytest.fixture
+def small_cache(monkeypatch):
+    """容量の小さいプロセス内キャッシュに差し替える"""
+    small = LRUCache(maxsize=8, max_set_groups=1)
+    monkeypatch.setattr(quiz_app, 'cache', small)
+    return small
+
+
+def test_filters_by_category_and_difficulty(client, questions):
+    for _ in range(10):
+        assert get_question(client, category='基礎知識').get_json()['category'] == '基礎知識'
+        assert get_question(client, difficulty='初級').get_json()['difficulty'] == '初級'
+        data = get_question(client, category='基礎知識', difficulty='上級').get_json()
+        assert data['id'] == 't_002'
+
+
+def test_empty_bucket_returns_404(client, questions):
+    response = get_question(client, category='経済', difficulty='上級')
+    assert response.status_code == 404
+    assert response.get_json()['error'] == '条件に合う問題がありません'
+
+
+def test_missed_only_requires_login(client, questions):
+    response = get_question(client, missed='1')
+    assert response.status_code == 401
+
+
+def test_wrong_answer_adds_to_missed_and_correct_answer_removes(user_client, questions):
+    assert get_question(user_client, missed='1').status_code == 404
+
+    miss(user_client, questions, 't_003')
+    for _ in range(5):
+        assert get_question(user_client, missed='1').get_json()['id'] == 't_003'
+    assert get_question(user_client, missed='1', category='経済').get_json()['id'] == 't_003'
+    assert get_question(user_client, missed='1', category='基礎知識').status_code == 404
+
+    # 間違えた問題モードで出題された問題に正解すると対象から外れる
+    assert get_question(user_client, missed='1').get_json()['id'] == 't_003'
+    answer(user_client, questions['t_003'], correct=True)
+    assert get_question(user_client, missed='1').status_code == 404
+    assert get_question(user_client, missed='1', category='経済').status_code == 404
+
+
+def test_stats_reset_clears_missed(user_client, questions):
+    miss(user_client, questions, 't_001')
+    assert get_question(user_client, missed='1').status_code == 200
+
+    assert user_client.delete('/api/stats').status_code == 200
+    assert get_question(user_client, missed='1').status_code == 404
+
+
+def test_missed_survives_cache_eviction(app, user_client, questions, small_cache):
+    miss(user_client, questions, 't_001')
+
+    # 他の利用者の出題でキャッシュ本体が何周も入れ替わっても消えない
+    for i in range(50):
+        get_question(app.test_client())
+        if i % 3 == 0:
+            assert get_question(user_client, missed='1').status_code == 200
+    data = get_question(user_client, missed='1', category='基礎知識').get_json()
+    assert data['id'] == 't_001'
+
+
+def test_missed_rebuilds_after_group_eviction(user_client, new_user_client, questions, small_cache):
+    miss(user_client, questions, 't_001')
+    miss(user_client, questions, 't_003')
+
+    # 別ユーザーの集合グループで押し出されても回答履歴から作り直す
+    other = new_user_client()
+    assert get_question(other, missed='1').status_code == 404
+
+    assert get_question(user_client, missed='1', category='基礎知識').get_json()['id'] == 't_001'
+    assert get_question(user_client, missed='1', category='経済').get_json()['id'] == 't_003'
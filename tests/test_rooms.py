@@ -0,0 +1,178 @@
+import json
+import threading
+
+import pytest
+
+import rooms
+from rooms import Room, RoomError, stream_room
+
+QUESTIONS = [
+    {'id': 'r_001', 'category': '基礎知識', 'question': '問題1', 'options': ['A', 'B', 'C'], 'correct_answer': 0},
+    {'id': 'r_002', 'category': '経済', 'question': '問題2', 'options': ['A', 'B', 'C'], 'correct_answer': 2},
+]
+
+
+@pytest.fixture(autouse=True)
+def empty_rooms(monkeypatch):
+    """テストごとにルーム一覧を空にする"""
+    monkeypatch.setattr(rooms, '_rooms', {})
+
+
+@pytest.fixture
+def room():
+    return Room('123456', 'host', list(QUESTIONS))
+
+
+def parse_events(chunks):
+    """SSEのチャンクを (イベント名, データ) のリストにする"""
+    events = []
+    for chunk in chunks:
+        if chunk.startswith(':'):
+            continue
+        lines = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_state_transitions(room):
+    alice = room.join('alice')
+    assert room.state == 'waiting'
+    assert room.scoreboard()['participants'] == 1
+
+    room.next_question()
+    assert room.state == 'question'
+    assert room.current_question['id'] == 'r_001'
+    room.reveal()
+    assert room.state == 'reveal'
+    with pytest.raises(RoomError):
+        room.reveal()
+    with pytest.raises(RoomError) as excinfo:
+        room.submit_answer(alice, 0)
+    assert excinfo.value.status == 409
+
+    room.next_question()
+    assert room.current_question['id'] == 'r_002'
+    room.next_question()
+    assert room.state == 'finished'
+
+
+def test_next_after_finish_is_rejected(room):
+    room.join('alice')
+    room.finish()
+    events = len(room.events)
+
+    with pytest.raises(RoomError) as excinfo:
+        room.next_question()
+    assert excinfo.value.status == 410
+    assert room.state == 'finished'
+
+    # 終了済みのルームを再度終了しても finished は1回だけ
+    room.finish()
+    assert len(room.events) == events
+    with pytest.raises(RoomError) as excinfo:
+        room.join('bob')
+    assert excinfo.value.status == 410
+
+
+def test_only_first_answer_is_scored(room):
+    alice = room.join('alice')
+    bob = room.join('bob')
+    room.next_question()
+
+    assert room.submit_answer(alice, 0) is True
+    with pytest.raises(RoomError) as excinfo:
+        room.submit_answer(alice, 1)
+    assert excinfo.value.status == 409
+    assert room.submit_answer(bob, 1) is False
+
+    board = room.scoreboard()
+    assert board['answered'] == 2
+    assert board['distribution'] == [1, 1, 0]
+    assert [(r['name'], r['score']) for r in board['ranking']] == [('alice', 1), ('bob', 0)]
+
+
+@pytest.mark.parametrize('answer', [True, False, '0', 1.0, -1, 3])
+def test_invalid_answers_are_rejected(room, answer):
+    alice = room.join('alice')
+    room.next_question()
+    with pytest.raises(RoomError) as excinfo:
+        room.submit_answer(alice, answer)
+    assert excinfo.value.status == 400
+
+
+def test_answer_requires_participant(room):
+    room.next_question()
+    with pytest.raises(RoomError) as excinfo:
+        room.submit_answer('unknown', 0)
+    assert excinfo.value.status == 403
+
+
+def test_stream_closes_on_finished(room):
+    stream = stream_room(room)
+    first = parse_events([next(stream)])
+    assert first == [('state', {'code': '123456', 'state': 'waiting', 'total_questions': 2, 'question': None})]
+
+    room.next_question()
+    room.finish()
+    names = [name for name, _ in parse_events(list(stream))]
+    assert names[:2] == ['question', 'finished']
+
+    # 終了済みのルームへの接続は state だけ送って閉じる
+    assert [name for name, data in parse_events(list(stream_room(room)))] == ['state']
+
+
+def test_stream_fans_out_to_many_consumers(room):
+    consumers = 300
+    received = [None] * consumers
+    started = threading.Barrier(consumers + 1)
+
+    def consume(i):
+        stream = stream_room(room)
+        chunks = [next(stream)]
+        started.wait()
+        chunks.extend(stream)
+        received[i] = [name for name, _ in parse_events(chunks)]
+
+    threads = [threading.Thread(target=consume, args=(i,), daemon=True) for i in range(consumers)]
+    for t in threads:
+        t.start()
+    started.wait()
+    room.next_question()
+    room.reveal()
+    room.finish()
+    for t in threads:
+        t.join(timeout=10)
+
+    assert all(not t.is_alive() for t in threads)
+    for names in received:
+        assert [n for n in names if n != 'scoreboard'] == ['state', 'question', 'reveal', 'finished']
+
+
+def test_http_room_flow(app, questions):
+    host = app.test_client()
+    player = app.test_client()
+
+    response = host.post('/api/rooms', json={'count': 1, 'category': '経済'})
+    assert response.status_code == 200
+    code = response.get_json()['code']
+
+    assert player.post(f'/api/rooms/{code}/join', json={'name': 'alice'}).status_code == 200
+    assert player.post(f'/api/rooms/{code}/next').status_code == 403
+
+    assert host.post(f'/api/rooms/{code}/next').get_json() == {'state': 'question'}
+    assert player.post(f'/api/rooms/{code}/answer', json={'answer': 2}).get_json() == {'accepted': True}
+    assert player.post(f'/api/rooms/{code}/answer', json={'answer': 2}).status_code == 409
+    assert host.post(f'/api/rooms/{code}/reveal').get_json() == {'state': 'reveal'}
+    assert host.post(f'/api/rooms/{code}/finish').get_json() == {'state': 'finished'}
+
+    response = host.post(f'/api/rooms/{code}/next')
+    assert response.status_code == 410
+    assert player.post(f'/api/rooms/{code}/answer', json={'answer': 2}).status_code == 409
+
+    ranking = rooms.get_room(code).scoreboard()['ranking']
+    assert [(r['name'], r['score']) for r in ranking] == [('alice', 1)]
+
+
+def test_http_rejects_unknown_room(client):
+    assert client.post('/api/rooms/000000/join', json={'name': 'alice'}).status_code == 404
+    assert client.get('/api/rooms/000000/events').status_code == 404